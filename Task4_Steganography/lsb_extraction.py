@@ -4,8 +4,20 @@ Try different methods to extract hidden message from the image
 """
 
 from PIL import Image
+import numpy as np
 import os
 
+
+def bits_to_message(bits, limit):
+    """Pack up to `limit` bits MSB-first and keep printable ASCII before the first null"""
+    n_bytes = min(len(bits) // 8, (limit + 7) // 8)
+    data = np.packbits(bits[:n_bytes * 8])
+    nulls = np.flatnonzero(data == 0)
+    if nulls.size:
+        data = data[:nulls[0]]
+    return data[(data >= 32) & (data <= 126)].tobytes().decode('ascii')
+
+
 # Load the received image
 img_path = "received_image.png"
 if not os.path.exists(img_path):
@@ -20,26 +32,22 @@ print(f"Image mode: {image.mode}")
 if image.mode != 'RGB':
     image = image.convert('RGB')
 
-pixels = list(image.getdata())
+# (H, W, 3) uint8 view of the raw pixel bytes; flatten to (N, 3) to keep
+# the original pixel order
+width, height = image.size
+arr = np.frombuffer(image.tobytes(), dtype=np.uint8).reshape(height, width, 3)
+pixels = arr.reshape(-1, 3)
 print(f"Total pixels: {len(pixels)}")
 
 # ============================================
 # Method 1: Standard LSB (Red channel only)
 # ============================================
 print("\n=== Method 1: Red Channel LSB ===")
-bits = []
-for pixel in pixels[:10000]:  # First 10k pixels
-    bits.append(pixel[0] & 1)
-
-message = ""
-for i in range(0, min(len(bits) - 7, 1000), 8):
-    byte_val = 0
-    for j in range(8):
-        byte_val = (byte_val << 1) | bits[i + j]
-    if 32 <= byte_val <= 126:
-        message += chr(byte_val)
-    elif byte_val == 0:
-        break
+# Only the red plane is needed: a contiguous (H, W) uint8 channel
+red = np.asarray(image.getchannel('R')).ravel()
+bits = red[:10000] & 1  # First 10k pixels
+
+message = bits_to_message(bits, 1000)
 
 print(f"Extracted: {message[:100]}...")
 
@@ -47,20 +55,9 @@ print(f"Extracted: {message[:100]}...")
 # Method 2: All RGB channels LSB
 # ============================================
 print("\n=== Method 2: RGB LSB ===")
-bits = []
-for pixel in pixels[:10000]:
-    for c in range(3):
-        bits.append(pixel[c] & 1)
-
-message = ""
-for i in range(0, min(len(bits) - 7, 1000), 8):
-    byte_val = 0
-    for j in range(8):
-        byte_val = (byte_val << 1) | bits[i + j]
-    if 32 <= byte_val <= 126:
-        message += chr(byte_val)
-    elif byte_val == 0:
-        break
+bits = (pixels[:10000] & 1).ravel()
+
+message = bits_to_message(bits, 1000)
 
 print(f"Extracted: {message[:100]}...")
 
@@ -68,29 +65,20 @@ print(f"Extracted: {message[:100]}...")
 # Method 3: Look for text patterns in LSB
 # ============================================
 print("\n=== Method 3: Full scan for readable text ===")
-bits = []
-for pixel in pixels:
-    for c in range(3):
-        bits.append(pixel[c] & 1)
+bits = (pixels & 1).ravel()
 
 # Try to find readable ASCII sequences
+# Only the first (1000 + 2000) bits can contribute, so pack just those
+data = np.packbits(bits[:min(len(bits) // 8, 375) * 8])
+printable = (data >= 32) & (data <= 126)
+
 best_message = ""
 for start in range(0, min(1000, len(bits)), 8):
-    message = ""
-    valid_chars = 0
-    for i in range(start, min(start + 2000, len(bits) - 7), 8):
-        byte_val = 0
-        for j in range(8):
-            byte_val = (byte_val << 1) | bits[i + j]
-        if 32 <= byte_val <= 126:
-            message += chr(byte_val)
-            valid_chars += 1
-        elif byte_val == 0:
-            break
-        else:
-            break
+    window = printable[start // 8:start // 8 + 250]
+    # Run of printable bytes up to the first null / non-printable byte
+    valid_chars = window.size if window.all() else int(np.argmin(window))
     if valid_chars > len(best_message):
-        best_message = message
+        best_message = data[start // 8:start // 8 + valid_chars].tobytes().decode('ascii')
 
 print(f"Best readable: {best_message[:100]}...")
 
@@ -98,20 +86,9 @@ print(f"Best readable: {best_message[:100]}...")
 # Method 4: Try LSB from the END of image
 # ============================================
 print("\n=== Method 4: End of image ===")
-bits = []
-for pixel in pixels[-10000:]:
-    for c in range(3):
-        bits.append(pixel[c] & 1)
-
-message = ""
-for i in range(0, min(len(bits) - 7, 1000), 8):
-    byte_val = 0
-    for j in range(8):
-        byte_val = (byte_val << 1) | bits[i + j]
-    if 32 <= byte_val <= 126:
-        message += chr(byte_val)
-    elif byte_val == 0:
-        break
+bits = (pixels[-10000:] & 1).ravel()
+
+message = bits_to_message(bits, 1000)
 
 print(f"Extracted: {message[:100]}...")
 
@@ -129,22 +106,9 @@ for key, val in info.items():
 # Method 6: Look at first 64x64 region
 # ============================================
 print("\n=== Method 6: First 64x64 pixels ===")
-bits = []
-for y in range(64):
-    for x in range(64):
-        pixel = image.getpixel((x, y))
-        for c in range(3):
-            bits.append(pixel[c] & 1)
-
-message = ""
-for i in range(0, min(len(bits) - 7, 500), 8):
-    byte_val = 0
-    for j in range(8):
-        byte_val = (byte_val << 1) | bits[i + j]
-    if 32 <= byte_val <= 126:
-        message += chr(byte_val)
-    elif byte_val == 0:
-        break
+bits = (arr[:64, :64] & 1).ravel()
+
+message = bits_to_message(bits, 500)
 
 print(f"Extracted: {message[:100]}...")
 
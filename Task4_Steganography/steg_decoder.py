@@ -14,17 +14,30 @@ Usage:
     python steg_decoder.py
     
 Requirements:
-    pip install paho-mqtt Pillow
+    pip install paho-mqtt Pillow numpy   (numpy optional, speeds up LSB extraction)
+    gcc -O2 -mbmi2 -shared -fPIC -o lsb_pext.so lsb_pext.c   (optional, BMI2 PEXT gather)
 """
 
 import paho.mqtt.client as mqtt
 import base64
 import json
-from PIL import Image
+from PIL import Image, ImageMode
+import ctypes
 import io
+import os
 import time
 import sys
 
+try:
+    import numpy as np
+except ImportError:  # extract_lsb_message falls back to pure-Python SWAR packing
+    np = None
+
+try:
+    from numba import njit, types
+except ImportError:  # extract_lsb_message uses np.packbits instead
+    njit = None
+
 # ============================================
 # CONFIGURATION
 # ============================================
@@ -47,6 +60,85 @@ next_topic = ""
 # ============================================
 # LSB STEGANOGRAPHY EXTRACTION
 # ============================================
+LSB_MASK = 0x0101010101010101    # bit 0 of each byte in a 64-bit word
+LSB_GATHER = 0x0102040810204080  # moves those 8 bits into the top byte, MSB first
+
+def iter_lsb_bytes_swar(channels):
+    """
+    Yield the LSBs of a byte string packed into bytes, without NumPy.
+    
+    Each group of 8 channel bytes is read as one big-endian 64-bit word,
+    masked down to its LSBs and collapsed into a single byte by one
+    multiply-and-shift instead of an 8-step shift loop.
+    """
+    for i in range(0, len(channels) - 7, 8):
+        word = int.from_bytes(channels[i:i + 8], "big") & LSB_MASK
+        yield ((word * LSB_GATHER) >> 56) & 0xFF
+
+if njit is not None and np is not None:
+    # Explicit signature: compiled once at import (and cached on disk)
+    # rather than on the first call inside the MQTT callback.
+    # PIL's tobytes() buffer is read-only, hence the readonly array type
+    @njit(types.uint8[::1](types.Array(types.uint8, 3, 'C', readonly=True), types.int64),
+          cache=True, fastmath=True, boundscheck=False)
+    def _lsb_bytes(arr, limit):
+        """Pack the RGB LSBs of an (H, W, bands) buffer MSB-first, up to `limit` bytes (-1 for all)"""
+        h, w, bands = arr.shape
+        channels = min(bands, 3)  # Only RGB, ignore Alpha
+        n_bytes = h * w * channels // 8
+        if 0 <= limit < n_bytes:
+            n_bytes = limit
+        
+        # One linear pass over the flat buffer keeps the access pattern a
+        # plain stride that the hardware prefetcher follows on its own
+        flat = arr.reshape(-1)
+        out = np.empty(n_bytes, dtype=np.uint8)
+        if channels == bands:
+            for i in range(n_bytes):
+                byte_val = 0
+                for j in range(8):
+                    byte_val = (byte_val << 1) | (flat[i * 8 + j] & 1)
+                out[i] = byte_val
+        else:
+            for i in range(n_bytes):
+                byte_val = 0
+                for j in range(8):
+                    k = i * 8 + j
+                    byte_val = (byte_val << 1) | (flat[(k // 3) * bands + k % 3] & 1)
+                out[i] = byte_val
+        return out
+else:
+    _lsb_bytes = None
+
+def _load_lsb_pext():
+    """Load the optional C helper built from lsb_pext.c, if present"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lsb_pext.so")
+    try:
+        lib = ctypes.CDLL(path)
+    except OSError:
+        return None
+    lib.lsb_extract_pext.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_size_t)
+    lib.lsb_extract_pext.restype = ctypes.c_size_t
+    return lib.lsb_extract_pext
+
+_lsb_extract_pext = _load_lsb_pext()
+
+def pack_lsb_pext(channels):
+    """Pack the LSBs of a byte string into bytes with the BMI2 PEXT helper"""
+    packed = (ctypes.c_char * (len(channels) // 8))()
+    n = _lsb_extract_pext(channels, packed, len(channels))
+    # Byte view over the ctypes buffer; avoids copying it out via .raw
+    return memoryview(packed).cast("B")[:n]
+
+def _rgb_channel_bytes(raw, n_bands):
+    """Drop the Alpha band from raw RGBA pixel bytes; other layouts pass through"""
+    if n_bands != 4:
+        return raw
+    channels = bytearray(len(raw) // 4 * 3)
+    for c in range(3):
+        channels[c::3] = raw[c::4]
+    return bytes(channels)
+
 def extract_lsb_message(image):
     """
     Extract hidden message from LSB of image pixels.
@@ -58,43 +150,98 @@ def extract_lsb_message(image):
     print("PHASE 3: LSB EXTRACTION")
     print("="*50)
     
-    pixels = list(image.getdata())
-    print(f"[LSB] Total pixels: {len(pixels)}")
+    # Raw pixel bytes are only one uint8 per band for 8-bit modes; 1-bit
+    # and 16/32-bit modes take their LSBs from the native pixel values
+    if ImageMode.getmode(image.mode).typestr != "|u1":
+        return _extract_lsb_native(image)
+    
+    width, height = image.size
+    n_bands = len(image.getbands())
+    raw = image.tobytes()
+    print(f"[LSB] Total pixels: {width * height}")
     print(f"[LSB] Image mode: {image.mode}")
     
-    bits = []
+    # Show first few pixels for debugging
+    for i in range(min(5, width * height)):
+        pixel = tuple(raw[i * n_bands:(i + 1) * n_bands][:3])
+        if n_bands == 1:
+            print(f"[LSB] Pixel {i}: Gray={pixel[0]}, LSB={pixel[0] & 1}")
+        else:
+            print(f"[LSB] Pixel {i}: RGB={pixel}, LSBs={[c & 1 for c in pixel]}")
+    
+    print(f"[LSB] Total bits extracted: {width * height * min(n_bands, 3)}")
+    
+    # Convert bits to characters (MSB first, 8 bits per byte)
+    if _lsb_extract_pext is not None:
+        packed = pack_lsb_pext(_rgb_channel_bytes(raw, n_bands))
+        if np is None:
+            return _decode_message(packed)
+        data = np.frombuffer(packed, dtype=np.uint8)
+    elif _lsb_bytes is not None:
+        buf = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, n_bands)
+        data = _lsb_bytes(buf, -1)
+    elif np is not None:
+        # Extract LSB from each RGB channel
+        bits = np.frombuffer(_rgb_channel_bytes(raw, n_bands), dtype=np.uint8) & 1
+        data = np.packbits(bits[:len(bits) // 8 * 8])
+    else:
+        return _decode_message(iter_lsb_bytes_swar(_rgb_channel_bytes(raw, n_bands)))
+    
+    return _decode_packed(data)
+
+def _extract_lsb_native(image):
+    """LSB extraction for modes whose pixels are not one byte per band"""
+    width, height = image.size
+    print(f"[LSB] Total pixels: {width * height}")
+    print(f"[LSB] Image mode: {image.mode}")
     
-    # Extract LSB from each RGB channel
-    for i, pixel in enumerate(pixels):
-        # Handle different image modes
+    for i in range(min(5, width * height)):
+        pixel = image.getpixel((i % width, i // width))
         if isinstance(pixel, int):
-            # Grayscale
-            bits.append(pixel & 1)
+            print(f"[LSB] Pixel {i}: Gray={pixel}, LSB={pixel & 1}")
         else:
-            # RGB or RGBA
-            for channel in pixel[:3]:  # Only RGB, ignore Alpha
-                bits.append(channel & 1)
-        
-        # Show first few pixels for debugging
-        if i < 5:
+            print(f"[LSB] Pixel {i}: RGB={pixel[:3]}, LSBs={[c & 1 for c in pixel[:3]]}")
+    
+    if np is None:
+        # getdata() is renamed get_flattened_data() in newer Pillow
+        pixels = getattr(image, "get_flattened_data", image.getdata)()
+        bits = []
+        for pixel in pixels:
             if isinstance(pixel, int):
-                print(f"[LSB] Pixel {i}: Gray={pixel}, LSB={pixel & 1}")
+                bits.append(pixel & 1)
             else:
-                lsbs = [c & 1 for c in pixel[:3]]
-                print(f"[LSB] Pixel {i}: RGB={pixel[:3]}, LSBs={lsbs}")
+                bits.extend(c & 1 for c in pixel[:3])  # Only RGB, ignore Alpha
+        print(f"[LSB] Total bits extracted: {len(bits)}")
+        return _decode_message(iter_lsb_bytes_swar(bytes(bits)))
     
+    # Keep the native dtype so 16-bit samples keep their real LSB
+    arr = np.asarray(image).reshape(width * height, -1)
+    bits = (arr[:, :3] & 1).astype(np.uint8).ravel()
     print(f"[LSB] Total bits extracted: {len(bits)}")
+    return _decode_packed(np.packbits(bits[:len(bits) // 8 * 8]))
+
+def _decode_packed(data):
+    """Apply the message stop rules to a uint8 array of packed LSB bytes"""
+    # Only accept printable ASCII; a non-printable character after the
+    # first few characters signals the end of the message
+    valid = ((data >= 32) & (data <= 126)) | (data == 10) | (data == 13)
+    seen = np.cumsum(valid) - valid
+    stop_mask = (data == 0) | (~valid & (seen > 5))
+    stop = int(np.argmax(stop_mask)) if stop_mask.any() else len(data)
+    
+    # Stop at null terminator
+    if stop < len(data) and data[stop] == 0:
+        print(f"[LSB] Null terminator found at bit position {stop * 8}")
     
-    # Convert bits to characters
+    return _report_message(data[:stop][valid[:stop]].tobytes().decode('ascii'))
+
+def _decode_message(data):
+    """Byte-wise equivalent of the NumPy stop rules, used without NumPy"""
     message = ""
-    for i in range(0, len(bits) - 7, 8):
-        byte_val = 0
-        for j in range(8):
-            byte_val = (byte_val << 1) | bits[i + j]
-        
+    for i, byte_val in enumerate(data):
         # Stop at null terminator
         if byte_val == 0:
-            print(f"[LSB] Null terminator found at bit position {i}")
+            print(f"[LSB] Null terminator found at bit position {i * 8}")
             break
         
         # Only accept printable ASCII
@@ -105,6 +252,9 @@ def extract_lsb_message(image):
             if len(message) > 5:  # We have some message already
                 break
     
+    return _report_message(message)
+
+def _report_message(message):
     print(f"\n[LSB] Extracted {len(message)} characters")
     print("="*50)
     print(f"HIDDEN MESSAGE: {message}")
@@ -0,0 +1,38 @@
+"""LSB extraction tests for image modes that are not one byte per band"""
+
+import numpy as np
+from PIL import Image
+
+from steg_decoder import extract_lsb_message
+
+MESSAGE = "CORALS BLOOM"
+
+
+def _message_bits(n_bits):
+    """MSB-first bits of MESSAGE plus a null terminator, zero padded"""
+    data = np.frombuffer(MESSAGE.encode("ascii") + b"\0", dtype=np.uint8)
+    bits = np.unpackbits(data)
+    return np.concatenate([bits, np.zeros(n_bits - len(bits), dtype=np.uint8)])
+
+
+def test_extracts_real_lsbs_from_16bit_image():
+    width, height = 16, 8
+    rng = np.random.default_rng(0)
+    # High bytes are random so an 8-bit conversion would scramble the LSBs
+    values = rng.integers(0, 1 << 15, width * height, dtype=np.uint16) & ~np.uint16(1)
+    values |= _message_bits(width * height)
+    image = Image.frombytes("I;16", (width, height), values.astype("<u2").tobytes())
+
+    assert extract_lsb_message(image) == MESSAGE
+
+
+def test_extracts_cmy_lsbs_from_cmyk_image():
+    width, height = 8, 8
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, (width * height, 4), dtype=np.uint8) & 0xFE
+    # Message lives in C, M and Y; K must be ignored like Alpha is
+    pixels[:, :3] |= _message_bits(width * height * 3).reshape(-1, 3)
+    pixels[:, 3] |= 1
+    image = Image.frombytes("CMYK", (width, height), pixels.tobytes())
+
+    assert extract_lsb_message(image) == MESSAGE
